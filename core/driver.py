@@ -8,6 +8,7 @@ This is the script to
 6. edit the video thumbnail
 """
 import argparse
+import asyncio
 import logging
 import os.path
 import sys
@@ -18,9 +19,9 @@ import pytube
 import vimeo
 
 from core.streaming_service import YouTubeService, VimeoService, StreamingService, SupportedServices
-from core.util import get_vimeo_client_configuration, get_video_configuration
+from core.util import get_vimeo_client_configuration, get_video_configuration, get_temporary_path
 from model.config import VimeoClientConfiguration, AppDirectoryConfiguration, VideoConfiguration, VideoMetadata
-from model.exception import UnsetConfigurationException
+from model.exception import UnsetConfigurationException, VimeoClientConfigurationException
 
 logging.basicConfig(
     filename='output.log',
@@ -98,8 +99,6 @@ class Driver:
                 "Download service or upload service is not set")
 
         video_id = video_config.video_id
-        start_time_in_sec = video_config.start_time_in_sec
-        end_time_in_sec = video_config.end_time_in_sec
         image = video_config.image_url
         resolution = video_config.resolution
         title = video_config.video_title
@@ -109,28 +108,17 @@ class Driver:
             current_date = today.strftime("%m/%d/%y")
             title = f"(CW) {current_date}"
 
-        suffix = f"{str(video_config.start_time_in_sec)}_{str(video_config.end_time_in_sec)}"
-        combined_video_name = f"combined_{resolution}.mp4"
-        trimmed_video_name = f"{suffix}_{resolution}.mp4"
+        trimmed_video_name = f"{video_config.start_time_in_sec}_{video_config.end_time_in_sec}_{resolution}.mp4"
 
         download_path = os.path.join(
             self.app_directory_config.videos_dir, video_id)
-        if not os.path.exists(download_path):
-            logging.info("Creating directory %s", download_path)
-            os.mkdir(download_path)
-        combined_video_path = os.path.join(download_path, combined_video_name)
         trimmed_video_path = os.path.join(download_path, trimmed_video_name)
 
-        self.streaming_services[self.download_service].download_video(
-            video_id, resolution, download_path, combined_video_name)
-
-        # Call ffmpeg to trim.
+        # Download, merge and trim the video in one pass, while the upload service gets ready.
         if not os.path.exists(trimmed_video_path):
-            trim_resource(
-                combined_video_path,
-                trimmed_video_path,
-                start_time_in_sec,
-                end_time_in_sec)
+            asyncio.run(
+                self._download_and_prepare_upload(
+                    video_config, download_path, trimmed_video_name))
             logging.info("Finished trimming the video")
 
         logging.info(
@@ -140,6 +128,33 @@ class Driver:
         self.streaming_services[self.upload_service].upload_video(
             trimmed_video_path, title, image)
 
+    async def _download_and_prepare_upload(
+            self,
+            video_config: VideoConfiguration,
+            download_path: str,
+            output_file_name: str) -> None:
+        """
+        Download the video with download service, concurrently with preparing the upload service. Worker threads
+        cannot be cancelled, so a failure to prepare the upload service is raised once the download also finishes.
+        :param video_config: Configuration for the video
+        :param download_path: Absolute path to the output destination folder
+        :param output_file_name: Name of the output video file
+        :return:
+        """
+        download_service = self.streaming_services[self.download_service]
+        upload_service = self.streaming_services[self.upload_service]
+
+        await asyncio.gather(
+            asyncio.to_thread(
+                download_service.download_video,
+                video_config.video_id,
+                video_config.resolution,
+                download_path,
+                output_file_name,
+                video_config.start_time_in_sec,
+                video_config.end_time_in_sec),
+            asyncio.to_thread(upload_service.prepare_upload))
+
 
 def trim_resource(
         input_path: str,
@@ -147,21 +162,26 @@ def trim_resource(
         start_time_in_sec: int,
         end_time_in_sec: int) -> None:
     """
-    Trim the resource based on start and end time in seconds
+    Trim the resource based on start and end time in seconds. Driver.process does not use this, as the streaming
+    service trims while merging the streams (see merge_and_trim); it is kept for trimming an existing video.
     :param input_path:
     :param output_path:
     :param start_time_in_sec:
     :param end_time_in_sec:
     :return:
     """
-    input_video = ffmpeg.input(input_path)
-    ffmpeg.output(
-        input_video,
-        output_path,
-        ss=start_time_in_sec,
-        to=end_time_in_sec,
-        vcodec='copy',
-        acodec='copy').run()
+    # Seek on the input, so ffmpeg jumps by container index instead of decoding up to the start time. Output is a
+    # fragmented MP4, so ffmpeg writes it in one pass without seeking back to patch the moov atom.
+    duration_in_sec = end_time_in_sec - start_time_in_sec
+    temporary_path = get_temporary_path(output_path)
+    ffmpeg.input(
+        input_path,
+        ss=start_time_in_sec).output(
+        temporary_path,
+        t=duration_in_sec,
+        c='copy',
+        movflags='frag_keyframe+empty_moov').run(overwrite_output=True)
+    os.replace(temporary_path, output_path)
 
 
 def main() -> None:
@@ -223,7 +243,8 @@ def main() -> None:
 
     try:
         driver.process(video_config)
-    except vimeo.exceptions.VideoUploadFailure as error:
+    except (vimeo.exceptions.VideoUploadFailure, vimeo.exceptions.APIRateLimitExceededFailure,
+            VimeoClientConfigurationException) as error:
         logging.error("Failed with exception %s", error)
         sys.exit(1)
 
@@ -1,14 +1,19 @@
 import logging
 import os
+import time
 import webbrowser
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from enum import Enum
 
 import ffmpeg
 import pytube
+import pytube.request
 import vimeo
 from pytube.cli import on_progress
 
+from core.util import get_temporary_path, probe_duration
 from model.config import VideoMetadata, VimeoClientConfiguration
 from model.exception import VimeoClientConfigurationException
 
@@ -38,14 +43,18 @@ class StreamingService(ABC):
             video_id: str,
             resolution: str,
             download_path: str,
-            output_file_name: str) -> bool:
+            output_file_name: str,
+            start_time_in_sec: int = None,
+            end_time_in_sec: int = None) -> bool:
         """
         Download the video from streaming service with input parameters to the output path. Output video must contain
-        both video and audio channels.
+        both video and audio channels, and is trimmed to the start and end time if supplied.
         :param video_id: ID of the video
         :param resolution: Resolution for the video (e.g. 1080p, 1440p)
         :param download_path: Absolute path to the output destination folder
         :param output_file_name: Name of the output video file
+        :param start_time_in_sec: Start time of the output video in seconds, from the beginning if not set
+        :param end_time_in_sec: End time of the output video in seconds, until the end if not set
         :return: Boolean flag representing whether the video completed downloading
         """
         pass
@@ -62,17 +71,70 @@ class StreamingService(ABC):
         """
         pass
 
+    def prepare_upload(self) -> None:
+        """
+        Prepare the streaming service for an upcoming upload (e.g. authenticate the client). Called concurrently with
+        the download, so any network round-trip here is hidden behind it.
+        :return:
+        """
+
+
+def merge_and_trim(
+        video_path: str,
+        audio_path: str,
+        output_path: str,
+        start_time_in_sec: int = None,
+        duration_in_sec: int = None) -> None:
+    """
+    Merge the video and audio streams into a single container, trimmed to the given window. Seek options are set on
+    the inputs so ffmpeg seeks by container index instead of decoding the skipped frames, and the moov atom is placed
+    at the front of the output so it is ready for upload.
+    :param video_path: Absolute path to the video stream
+    :param audio_path: Absolute path to the audio stream
+    :param output_path: Absolute path to the output video
+    :param start_time_in_sec: Start time of the output video in seconds, from the beginning if not set
+    :param duration_in_sec: Duration of the output video in seconds, until the end if not set
+    :return:
+    """
+    input_options = {}
+    if start_time_in_sec:
+        input_options['ss'] = start_time_in_sec
+    if duration_in_sec is not None:
+        input_options['t'] = duration_in_sec
+    input_video_stream = ffmpeg.input(video_path, **input_options)
+    input_audio_stream = ffmpeg.input(audio_path, **input_options)
+    temporary_path = get_temporary_path(output_path)
+    ffmpeg.output(
+        input_video_stream,
+        input_audio_stream,
+        temporary_path,
+        vcodec='copy',
+        movflags='+faststart').run(overwrite_output=True)
+    os.replace(temporary_path, output_path)
+
 
 YOUTUBE_URL_PREFIX: str = "https://www.youtube.com/watch?v="
 
+# pytube fetches streams in 9MB range requests by default. Larger ranges cut down on HTTP round-trips, at the cost of
+# memory: pytube reads each range response whole, so with the video and audio streams downloading in parallel this
+# buffers up to ~180MB at peak. A larger range is also a larger retry unit if YouTube drops the connection mid-range.
+PYTUBE_RANGE_SIZE: int = 90 * 1024 * 1024
+pytube.request.default_range_size = PYTUBE_RANGE_SIZE
+
 
 class YouTubeService(StreamingService):
 
+    def __init__(self):
+        self.video_metadata_cache = {}
+
     def get_video_metadata(self, video_id) -> VideoMetadata:
+        # Metadata does not change between lookups, so skip the round-trips for videos already seen
+        if video_id in self.video_metadata_cache:
+            return self.video_metadata_cache[video_id]
         url = self._get_youtube_url(video_id)
         try:
             youtube = pytube.YouTube(url, on_progress_callback=on_progress)
-            return VideoMetadata(
+            video_metadata = VideoMetadata(
                 youtube.video_id,
                 youtube.title,
                 youtube.author,
@@ -83,45 +145,77 @@ class YouTubeService(StreamingService):
         except pytube.exceptions.PytubeError as error:
             logging.error("Failed to get metadata with video id %s", video_id)
             raise error
+        self.video_metadata_cache[video_id] = video_metadata
+        return video_metadata
 
     def download_video(
             self,
             video_id: str,
             resolution: str,
             download_path: str,
-            output_file_name: str) -> bool:
+            output_file_name: str,
+            start_time_in_sec: int = None,
+            end_time_in_sec: int = None) -> bool:
         url = self._get_youtube_url(video_id)
         video_stream_file_name = self._get_video_stream_file_name(resolution)
         audio_stream_file_name = self._get_audio_stream_file_name()
-        # Download the separate video/audio streams
-        try:
-            youtube = pytube.YouTube(
-                url, on_progress_callback=on_progress)
-            video_stream = youtube.streams.filter(
-                resolution=resolution).first()
-            video_stream.download(download_path, video_stream_file_name)
-            audio_stream = youtube.streams.filter(only_audio=True).first()
-            audio_stream.download(download_path, audio_stream_file_name)
-        except pytube.exceptions.PytubeError as error:
-            logging.error(
-                "Failed to download video stream or audio stream file from YouTube %s",
-                error)
-            raise error
-
         absolute_video_stream_path = os.path.join(
             download_path, video_stream_file_name)
         absolute_audio_stream_path = os.path.join(
             download_path, audio_stream_file_name)
         absolute_output_path = os.path.join(download_path, output_file_name)
 
-        # Combine the two streams into one using FFMPEG
-        input_video_stream = ffmpeg.input(absolute_video_stream_path)
-        input_audio_stream = ffmpeg.input(absolute_audio_stream_path)
-        ffmpeg.output(
-            input_video_stream,
-            input_audio_stream,
+        # Download the separate video/audio streams, skipping the YouTube round-trips if both are already downloaded
+        os.makedirs(download_path, exist_ok=True)
+        with os.scandir(download_path) as entries:
+            present_file_names = {entry.name for entry in entries}
+        missing_file_names = [
+            file_name for file_name in (video_stream_file_name, audio_stream_file_name)
+            if file_name not in present_file_names]
+        if missing_file_names:
+            try:
+                youtube = pytube.YouTube(
+                    url, on_progress_callback=on_progress)
+                streams = {
+                    video_stream_file_name: youtube.streams.filter(
+                        resolution=resolution).first(),
+                    audio_stream_file_name: youtube.streams.filter(
+                        only_audio=True).first()
+                }
+                # The two streams are independent, so download them concurrently
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = [
+                        executor.submit(
+                            self._download_stream,
+                            streams[file_name],
+                            download_path,
+                            file_name) for file_name in missing_file_names]
+                    for future in futures:
+                        future.result()
+            except pytube.exceptions.PytubeError as error:
+                logging.error(
+                    "Failed to download video stream or audio stream file from YouTube %s",
+                    error)
+                raise error
+        else:
+            logging.info(
+                "Using downloaded video stream and audio stream in %s",
+                download_path)
+
+        if end_time_in_sec is not None:
+            end_time_in_sec = self._validate_trim_bounds(
+                absolute_video_stream_path, start_time_in_sec or 0, end_time_in_sec)
+
+        # Combine and trim the two streams in a single FFMPEG pass
+        duration_in_sec = None
+        if end_time_in_sec is not None:
+            duration_in_sec = end_time_in_sec - (start_time_in_sec or 0)
+        merge_and_trim(
+            absolute_video_stream_path,
+            absolute_audio_stream_path,
             absolute_output_path,
-            vcodec='copy').run()
+            start_time_in_sec,
+            duration_in_sec)
         return True
 
     def upload_video(
@@ -132,6 +226,32 @@ class YouTubeService(StreamingService):
         raise NotImplementedError(
             "This operation is not yet implemented for YouTubeService.")
 
+    @staticmethod
+    def _validate_trim_bounds(
+            video_path: str,
+            start_time_in_sec: int,
+            end_time_in_sec: int) -> float:
+        # Check the trim window against the video before invoking ffmpeg, and clamp the end to the video length
+        if end_time_in_sec <= start_time_in_sec:
+            raise ValueError(
+                f"End time {end_time_in_sec} must be after start time {start_time_in_sec}")
+        video_duration_in_sec = probe_duration(video_path)
+        if start_time_in_sec >= video_duration_in_sec:
+            raise ValueError(
+                f"Start time {start_time_in_sec} is past the end of the video ({video_duration_in_sec} seconds)")
+        return min(end_time_in_sec, video_duration_in_sec)
+
+    @staticmethod
+    def _download_stream(
+            stream: pytube.Stream,
+            download_path: str,
+            file_name: str) -> None:
+        # Download under a temporary name, so an interrupted download is not mistaken for a finished stream
+        output_path = os.path.join(download_path, file_name)
+        temporary_path = get_temporary_path(output_path)
+        stream.download(download_path, os.path.basename(temporary_path))
+        os.replace(temporary_path, output_path)
+
     @staticmethod
     def _get_youtube_url(video_id: str) -> str:
         return YOUTUBE_URL_PREFIX + video_id
@@ -145,10 +265,103 @@ class YouTubeService(StreamingService):
         return "audio_stream.mp3"
 
 
+# Vimeo bans clients that keep calling past the rate limit, so back off before the quota runs out
+VIMEO_RATE_LIMIT_THRESHOLD: int = 2
+VIMEO_MAX_RETRIES: int = 3
+VIMEO_BACKOFF_IN_SEC: int = 1
+HTTP_TOO_MANY_REQUESTS: int = 429
+
+
+def _get_rate_limit_reset_in_sec(headers) -> float:
+    """
+    Get the seconds until the rate limit resets, from Retry-After or X-RateLimit-Reset response header
+    :param headers: Headers of the Vimeo response
+    :return: Seconds until the rate limit resets, 0 if unknown
+    """
+    try:
+        retry_after = headers.get('Retry-After')
+        if retry_after is not None:
+            return max(0.0, float(retry_after))
+        reset = headers.get('X-RateLimit-Reset')
+        if reset is None:
+            return 0.0
+        reset_time = datetime.fromisoformat(reset)
+        if reset_time.tzinfo is None:
+            reset_time = reset_time.replace(tzinfo=timezone.utc)
+        return max(0.0, (reset_time - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _wait_for_rate_limit_reset(headers) -> None:
+    """
+    Wait for the rate limit to reset, if the remaining quota in X-RateLimit-Remaining response header is running out
+    :param headers: Headers of the Vimeo response
+    :return:
+    """
+    try:
+        remaining = int(headers.get('X-RateLimit-Remaining'))
+    except (TypeError, ValueError):
+        return
+    if remaining <= VIMEO_RATE_LIMIT_THRESHOLD:
+        wait_in_sec = _get_rate_limit_reset_in_sec(headers)
+        logging.info(
+            "Vimeo rate limit remaining is %s, waiting %s seconds for reset",
+            remaining,
+            wait_in_sec)
+        time.sleep(wait_in_sec)
+
+
+def _rate_limited_call(
+        func,
+        *args,
+        retryable_errors: tuple = (vimeo.exceptions.BaseVimeoException,),
+        **kwargs):
+    """
+    Call the Vimeo client function, respecting the rate limit headers of the response. Waits for the rate limit to
+    reset when the remaining quota is running out, and retries with exponential backoff when rate limited. Pacing on
+    the rate limit headers only applies to functions returning the response itself (e.g. get), not ones returning
+    parsed JSON (e.g. upload_picture).
+    :param func: Vimeo client function to call
+    :param retryable_errors: Vimeo exceptions that are safe to retry when rate limited
+    :return: Result of the function call
+    :raises APIRateLimitExceededFailure: If still rate limited after the retries
+    """
+    for attempt in range(VIMEO_MAX_RETRIES + 1):
+        backoff_in_sec = VIMEO_BACKOFF_IN_SEC * 2 ** attempt
+        try:
+            response = func(*args, **kwargs)
+        except vimeo.exceptions.BaseVimeoException as error:
+            if not isinstance(error, retryable_errors) \
+                    or getattr(error, 'status_code', None) != HTTP_TOO_MANY_REQUESTS \
+                    or attempt == VIMEO_MAX_RETRIES:
+                raise error
+            logging.warning(
+                "Rate limited by Vimeo, retrying in %s seconds", backoff_in_sec)
+            time.sleep(backoff_in_sec)
+            continue
+
+        headers = getattr(response, 'headers', None)
+        if headers is None:
+            return response
+        if getattr(response, 'status_code', None) == HTTP_TOO_MANY_REQUESTS:
+            if attempt == VIMEO_MAX_RETRIES:
+                raise vimeo.exceptions.APIRateLimitExceededFailure(
+                    response, "Vimeo rate limit exceeded after retries")
+            wait_in_sec = max(backoff_in_sec, _get_rate_limit_reset_in_sec(headers))
+            logging.warning(
+                "Rate limited by Vimeo, retrying in %s seconds", wait_in_sec)
+            time.sleep(wait_in_sec)
+            continue
+        _wait_for_rate_limit_reset(headers)
+        return response
+
+
 class VimeoService(StreamingService):
 
     def __init__(self):
         self.client_config = None
+        self._client = None
 
     def get_video_metadata(self, video_id) -> VideoMetadata:
         raise NotImplementedError(
@@ -159,25 +372,40 @@ class VimeoService(StreamingService):
             video_id: str,
             resolution: str,
             download_path: str,
-            output_file_name: str) -> bool:
+            output_file_name: str,
+            start_time_in_sec: int = None,
+            end_time_in_sec: int = None) -> bool:
         raise NotImplementedError(
             "This operation is not yet implemented for VimeoService")
 
     def upload_video(self, video_path: str, video_title: str,
                      thumbnail_image_path: str = None) -> bool:
+        # Call internal method
+        return self._upload_video(
+            self._get_client(),
+            video_path,
+            video_title,
+            thumbnail_image_path)
+
+    def prepare_upload(self) -> None:
+        # Verify the credentials, so a bad config fails before attempting the upload
+        response = _rate_limited_call(self._get_client().get, '/me')
+        if response.status_code != 200:
+            raise VimeoClientConfigurationException(
+                f"Failed to authenticate Vimeo client with status {response.status_code}")
+
+    def _get_client(self) -> vimeo.VimeoClient:
         # First check if client config is set, otherwise raise exception
         if self.client_config is None:
             raise VimeoClientConfigurationException(
                 "Vimeo client configuration is not set")
-        # Call internal method
-        return self._upload_video(
-            vimeo.VimeoClient(
+        # Reuse the client, so its session keeps the connections to Vimeo alive across uploads
+        if self._client is None:
+            self._client = vimeo.VimeoClient(
                 token=self.client_config.token,
                 key=self.client_config.key,
-                secret=self.client_config.secret),
-            video_path,
-            video_title,
-            thumbnail_image_path)
+                secret=self.client_config.secret)
+        return self._client
 
     @staticmethod
     def _upload_video(
@@ -187,12 +415,8 @@ class VimeoService(StreamingService):
             thumbnail_image_path: str = None) -> bool:
         # Try uploading the video using Vimeo client
         try:
-            url = vimeo_client.upload(video_path, data={
-                'name': video_title,
-                'privacy': {
-                    'comments': 'nobody'
-                }
-            })
+            url = vimeo_client.upload(
+                video_path, data=VimeoService._get_video_data(video_title))
         except vimeo.exceptions.VideoUploadFailure as error:
             logging.error(
                 "Failed to upload video from path %s with title %s - %s",
@@ -201,12 +425,26 @@ class VimeoService(StreamingService):
                 error)
             raise error
 
-        # Set the thumbnail image on video if exists
-        if url is not None and thumbnail_image_path:
-            vimeo_client.upload_picture(
-                url, thumbnail_image_path, activate=True)
-
-        video_data = vimeo_client.get(url + '?fields=link').json()
+        # Set the thumbnail image on video if exists, while fetching the video link
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = []
+            if url is not None and thumbnail_image_path:
+                # upload_picture creates, uploads and activates the picture in separate requests. Only retry when the
+                # creation is rate limited, as retrying a later step would leave the created picture orphaned.
+                futures.append(executor.submit(
+                    _rate_limited_call,
+                    vimeo_client.upload_picture,
+                    url,
+                    thumbnail_image_path,
+                    retryable_errors=(vimeo.exceptions.PictureCreationFailure,),
+                    activate=True))
+            link_future = executor.submit(
+                _rate_limited_call, vimeo_client.get, url + '?fields=link')
+            futures.append(link_future)
+            for future in as_completed(futures):
+                future.result()
+
+        video_data = link_future.result().json()
         video_url = video_data['link']
         logging.info("Video link is %s", video_url)
 
@@ -215,5 +453,17 @@ class VimeoService(StreamingService):
 
         return True
 
+    @staticmethod
+    def _get_video_data(video_title: str) -> dict:
+        # All video metadata is sent with the upload request, rather than edited one field at a time after the upload
+        return {
+            'name': video_title,
+            'privacy': {
+                'comments': 'nobody'
+            }
+        }
+
     def update_client_config(self, client_config: VimeoClientConfiguration):
+        if client_config != self.client_config:
+            self._client = None
         self.client_config = client_config
@@ -3,8 +3,10 @@ Utility model used by application
 """
 
 import logging
+import os
 from os.path import exists
 
+import ffmpeg
 import yaml
 from cryptography.fernet import Fernet
 
@@ -29,6 +31,37 @@ def get_seconds(time_str: str) -> int:
     return int(hour) * 3600 + int(minute) * 60 + int(second)
 
 
+TEMPORARY_FILE_PREFIX = '.tmp_'
+
+
+def get_temporary_path(path: str) -> str:
+    """
+    Get the temporary path to write the file to, before publishing it to the path with os.replace. The temporary
+    file sits in the same directory, so the replace is atomic and a crash never leaves a partial file at the path.
+    :param path: Absolute path to the file
+    :return: Absolute path to the temporary file
+    """
+    directory, file_name = os.path.split(path)
+    return os.path.join(directory, TEMPORARY_FILE_PREFIX + file_name)
+
+
+def probe_duration(path: str) -> float:
+    """
+    Get duration of the media file using ffprobe.
+    :param path: Absolute path to the media file
+    :return: Duration in seconds
+    """
+    probe = ffmpeg.probe(path)
+    if 'duration' in probe['format']:
+        return float(probe['format']['duration'])
+    # Some containers only carry the duration on the streams
+    stream_durations = [float(stream['duration'])
+                        for stream in probe['streams'] if 'duration' in stream]
+    if not stream_durations:
+        raise ValueError(f"Failed to probe the duration of {path}")
+    return max(stream_durations)
+
+
 def get_vimeo_client_configuration(
         config_path: str) -> VimeoClientConfiguration:
 
@@ -2,11 +2,16 @@ import os
 from os.path import exists
 from unittest import mock
 
+import pytest
+import vimeo
 from moviepy.video.io.VideoFileClip import VideoFileClip
 from mutagen.mp4 import MP4
 
-from core.driver import trim_resource
-from core.streaming_service import YouTubeService, VimeoService
+from core.driver import Driver, trim_resource
+from core.streaming_service import SupportedServices, YouTubeService, VimeoService, merge_and_trim, \
+    _rate_limited_call
+from model.config import AppDirectoryConfiguration, VideoConfiguration
+from model.exception import VimeoClientConfigurationException
 
 
 def test_download_youtube_resources_and_combine_short(tmpdir) -> None:
@@ -29,6 +34,142 @@ def test_download_youtube_resources_and_combine_long(tmpdir) -> None:
         tmpdir, "Xofxcgkag1M", "1080p", 4190, 1445, 3887)
 
 
+def test_download_youtube_video_skips_downloaded_streams(tmpdir) -> None:
+    """
+    Test downloading only missing streams from YouTube using mock client
+    :return: Nothing
+    """
+    service = YouTubeService()
+    open(os.path.join(tmpdir, 'video_stream_1080p.mp4'), 'w').close()
+
+    def _download(output_path, filename):
+        open(os.path.join(output_path, filename), 'w').close()
+
+    with mock.patch('pytube.YouTube') as youtube_class, \
+            mock.patch('core.streaming_service.merge_and_trim') as merge:
+        stream = youtube_class.return_value.streams.filter.return_value.first.return_value
+        stream.download.side_effect = _download
+
+        # Only the missing audio stream is downloaded
+        service.download_video("XsX3ATc3FbA", "1080p", tmpdir, "combined_video.mp4")
+        youtube_class.assert_called_once()
+        stream.download.assert_called_once_with(tmpdir, '.tmp_audio_stream.mp3')
+        assert exists(os.path.join(tmpdir, 'audio_stream.mp3'))
+
+        # No YouTube lookup once both streams are downloaded
+        youtube_class.reset_mock()
+        service.download_video("XsX3ATc3FbA", "1080p", tmpdir, "combined_video.mp4")
+        youtube_class.assert_not_called()
+        assert merge.call_count == 2
+
+
+def test_download_youtube_video_validates_trim_bounds(tmpdir) -> None:
+    """
+    Test the trim window is checked against the video before merging
+    :return: Nothing
+    """
+    service = YouTubeService()
+    video_stream_path = os.path.join(tmpdir, 'video_stream_1080p.mp4')
+    audio_stream_path = os.path.join(tmpdir, 'audio_stream.mp3')
+    output_path = os.path.join(tmpdir, 'combined_video.mp4')
+    open(video_stream_path, 'w').close()
+    open(audio_stream_path, 'w').close()
+
+    with mock.patch('core.streaming_service.probe_duration', return_value=252.12) as probe, \
+            mock.patch('core.streaming_service.merge_and_trim') as merge:
+        service.download_video("XsX3ATc3FbA", "1080p", tmpdir, "combined_video.mp4", 60, 120)
+        probe.assert_called_once_with(video_stream_path)
+        merge.assert_called_with(video_stream_path, audio_stream_path, output_path, 60, 60)
+
+        # End time past the end of the video is clamped to the video length
+        service.download_video("XsX3ATc3FbA", "1080p", tmpdir, "combined_video.mp4", 60, 300)
+        merge.assert_called_with(video_stream_path, audio_stream_path, output_path, 60, 252.12 - 60)
+
+        merge.reset_mock()
+        with pytest.raises(ValueError, match="must be after start time"):
+            service.download_video("XsX3ATc3FbA", "1080p", tmpdir, "combined_video.mp4", 120, 60)
+        with pytest.raises(ValueError, match="past the end of the video"):
+            service.download_video("XsX3ATc3FbA", "1080p", tmpdir, "combined_video.mp4", 300, 360)
+        merge.assert_not_called()
+
+
+def test_download_youtube_video_creates_download_path(tmpdir) -> None:
+    """
+    Test downloading into a directory that does not exist yet using mock client
+    :return: Nothing
+    """
+    service = YouTubeService()
+    download_path = os.path.join(tmpdir, "XsX3ATc3FbA")
+
+    def _download(output_path, filename):
+        open(os.path.join(output_path, filename), 'w').close()
+
+    with mock.patch('pytube.YouTube') as youtube_class, \
+            mock.patch('core.streaming_service.merge_and_trim'):
+        stream = youtube_class.return_value.streams.filter.return_value.first.return_value
+        stream.download.side_effect = _download
+        service.download_video("XsX3ATc3FbA", "1080p", download_path, "combined_video.mp4")
+
+    assert exists(os.path.join(download_path, 'video_stream_1080p.mp4'))
+    assert exists(os.path.join(download_path, 'audio_stream.mp3'))
+
+
+def test_get_youtube_video_metadata_is_cached() -> None:
+    """
+    Test video metadata is looked up once per video using mock client
+    :return: Nothing
+    """
+    service = YouTubeService()
+    with mock.patch('pytube.YouTube') as youtube_class:
+        youtube_class.return_value.streams = [mock.MagicMock(resolution='1080p')]
+        video_metadata = service.get_video_metadata("XsX3ATc3FbA")
+        assert service.get_video_metadata("XsX3ATc3FbA") is video_metadata
+        youtube_class.assert_called_once()
+        assert video_metadata.resolutions == {'1080p'}
+
+
+def test_driver_process(tmpdir) -> None:
+    """
+    Test processing the video with mock download and upload services
+    :return: Nothing
+    """
+    driver = Driver()
+    driver.update_app_directory_config(AppDirectoryConfiguration(tmpdir, tmpdir, tmpdir))
+    driver.update_download_service(SupportedServices.YOUTUBE)
+    driver.update_upload_service(SupportedServices.VIMEO)
+    video_config = VideoConfiguration("XsX3ATc3FbA", 60, 120, "1080p", "new title")
+    trimmed_video_path = os.path.join(tmpdir, "XsX3ATc3FbA", "60_120_1080p.mp4")
+
+    with mock.patch.object(YouTubeService, 'download_video') as download, \
+            mock.patch.object(VimeoService, 'prepare_upload') as prepare, \
+            mock.patch.object(VimeoService, 'upload_video') as upload:
+        # Download runs alongside preparing the upload
+        driver.process(video_config)
+        download.assert_called_once_with(
+            "XsX3ATc3FbA", "1080p", os.path.join(tmpdir, "XsX3ATc3FbA"), "60_120_1080p.mp4", 60, 120)
+        prepare.assert_called_once()
+        upload.assert_called_once_with(trimmed_video_path, "new title", None)
+
+        # Failed auth check stops the upload
+        download.reset_mock()
+        upload.reset_mock()
+        prepare.side_effect = VimeoClientConfigurationException("Failed to authenticate")
+        with pytest.raises(VimeoClientConfigurationException):
+            driver.process(video_config)
+        download.assert_called_once()
+        upload.assert_not_called()
+
+        # Nothing to download or prepare once the trimmed video exists
+        os.makedirs(os.path.dirname(trimmed_video_path), exist_ok=True)
+        open(trimmed_video_path, 'w').close()
+        download.reset_mock()
+        prepare.reset_mock()
+        driver.process(video_config)
+        download.assert_not_called()
+        prepare.assert_not_called()
+        upload.assert_called_once_with(trimmed_video_path, "new title", None)
+
+
 def test_upload_video_to_vimeo() -> None:
     """
     Test uploading video to vimeo using mock client
@@ -37,6 +178,7 @@ def test_upload_video_to_vimeo() -> None:
 
     client_config = mock.MagicMock()
     client = mock.MagicMock()
+    client.get.return_value.headers = {}
     video_path = "/path/to/video"
     video_title = "new title"
 
@@ -53,6 +195,72 @@ def test_upload_video_to_vimeo() -> None:
     client.upload.assert_called_with(video_path, data=data_json)
 
 
+def test_prepare_upload_to_vimeo() -> None:
+    """
+    Test verifying vimeo credentials before upload using mock client
+    :return: Nothing
+    """
+    service = VimeoService()
+    with pytest.raises(VimeoClientConfigurationException, match="not set"):
+        service.prepare_upload()
+
+    service.update_client_config(mock.MagicMock())
+    with mock.patch('vimeo.VimeoClient') as client_class:
+        client = client_class.return_value
+        client.get.return_value.headers = {}
+        client.get.return_value.status_code = 200
+        service.prepare_upload()
+        client.get.assert_called_with('/me')
+
+        client.get.return_value.status_code = 401
+        with pytest.raises(VimeoClientConfigurationException, match="401"):
+            service.prepare_upload()
+
+        # Client is reused until the config changes
+        assert client_class.call_count == 1
+        client.get.return_value.status_code = 200
+        service.update_client_config(mock.MagicMock())
+        service.prepare_upload()
+        assert client_class.call_count == 2
+
+
+def test_rate_limited_call() -> None:
+    """
+    Test Vimeo calls back off when rate limited using mock responses
+    :return: Nothing
+    """
+    rate_limited = mock.MagicMock(status_code=429, headers={'Retry-After': '5'})
+    running_out = mock.MagicMock(status_code=200, headers={
+        'X-RateLimit-Remaining': '1',
+        'X-RateLimit-Reset': '1970-01-01T00:00:00+00:00'})
+    func = mock.MagicMock(side_effect=[rate_limited, running_out])
+
+    with mock.patch('time.sleep') as sleep:
+        assert _rate_limited_call(func, '/me') is running_out
+        func.assert_called_with('/me')
+        # Waits for Retry-After on 429, and does not wait for a reset already passed
+        sleep.assert_has_calls([mock.call(5.0), mock.call(0.0)])
+
+    # Raises once the retries run out, rather than returning the 429 response
+    func = mock.MagicMock(return_value=rate_limited)
+    with mock.patch('time.sleep') as sleep:
+        with pytest.raises(vimeo.exceptions.APIRateLimitExceededFailure):
+            _rate_limited_call(func, '/me')
+        assert func.call_count == 4
+        assert sleep.call_count == 3
+
+    # Only rate limited errors listed as retryable are retried
+    rate_limited_response = mock.MagicMock(status_code=429)
+    func = mock.MagicMock(side_effect=[
+        vimeo.exceptions.PictureCreationFailure(rate_limited_response, "Failed to create"),
+        vimeo.exceptions.PictureUploadFailure(rate_limited_response, "Failed to upload")])
+    with mock.patch('time.sleep') as sleep:
+        with pytest.raises(vimeo.exceptions.PictureUploadFailure):
+            _rate_limited_call(func, retryable_errors=(vimeo.exceptions.PictureCreationFailure,))
+        assert func.call_count == 2
+        sleep.assert_called_once_with(1)
+
+
 def _test_download_youtube_resources_and_combine(
         tmpdir,
         test_video_id: str,
@@ -102,3 +310,16 @@ def _test_download_youtube_resources_and_combine(
     # trim_length <= video_duration <= trim_length + 1
     assert trim_length <= int(video.duration) <= trim_length + 1
     assert trim_length <= int(video.duration) <= trim_length + 1
+
+    fused_path = os.path.join(tmpdir, "fused_video.mp4")
+    merge_and_trim(
+        expected_video_stream_path,
+        expected_audio_stream_path,
+        fused_path,
+        trim_start_sec,
+        trim_length)
+
+    assert exists(fused_path)
+    video = VideoFileClip(fused_path)
+    assert trim_length <= int(video.duration) <= trim_length + 1
+    assert trim_length <= int(video.audio.duration) <= trim_length + 1
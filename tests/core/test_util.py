@@ -1,10 +1,11 @@
 import os
+from unittest import mock
 
 import pytest
 import yaml
 from cryptography.fernet import Fernet
 
-from core.util import get_vimeo_client_configuration, get_seconds, FERNET_KEY
+from core.util import get_vimeo_client_configuration, get_seconds, get_temporary_path, probe_duration, FERNET_KEY
 from model.config import VIMEO_CONFIG_FILE_NAME
 
 
@@ -26,6 +27,31 @@ def test_get_seconds() -> None:
     assert hour_time_and_one_second_in_sec == 60 * 60 + 1
 
 
+def test_get_temporary_path() -> None:
+    path = os.path.join('path', 'to', 'video.mp4')
+    assert get_temporary_path(path) == os.path.join('path', 'to', '.tmp_video.mp4')
+
+
+def test_probe_duration() -> None:
+    with mock.patch('ffmpeg.probe') as probe:
+        probe.return_value = {
+            'format': {'duration': '252.120000'},
+            'streams': [{'duration': '252.000000'}]
+        }
+        assert probe_duration('/path/to/video') == 252.12
+
+        # Fall back to the longest stream if the container has no duration
+        probe.return_value = {
+            'format': {},
+            'streams': [{'duration': '251.5'}, {'duration': '252.0'}, {}]
+        }
+        assert probe_duration('/path/to/video') == 252.0
+
+        probe.return_value = {'format': {}, 'streams': [{}]}
+        with pytest.raises(ValueError, match="Failed to probe the duration"):
+            probe_duration('/path/to/video')
+
+
 def test_get_vimeo_configuration(tmpdir) -> None:
     with pytest.raises(Exception, match="Config file does not exist"):
         invalid_path = "foo/bar"